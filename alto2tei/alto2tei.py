@@ -1,3 +1,5 @@
+import argparse
+import gzip
 import os
 import re
 import sys
@@ -5,11 +7,17 @@ from datetime import datetime
 
 from lxml import etree
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # normalisation.py is shared with text-extraction.py
+from normalisation import TABLE, load_table, compile_table
+
+from elements.geometry import new_stats
 from elements.sourcedoc import sourcedoc
 from elements.teiheader import teiheader
 from elements.body import body
+from shards import write_shards
 
 NS = {'a':"http://www.loc.gov/standards/alto/ns-v4#"}  # XML-ALTO namespace
+EXTENSIONS = {None:".xml", "gzip":".xml.gz", "zstd":".xml.zst"}  # output file extension for each compression
 
 
 def order_files(dir):
@@ -30,13 +38,18 @@ def order_files(dir):
     return ordered_files
 
 
-def make_tei(ordered_files, directory):
+def make_tei(ordered_files, directory, tolerance=None, compression=None, shard_dir=None, reading_order=False, normaliser=None):
     """Creates an XML-TEI file for one document. The document's pages must be encoded in XML-ALTO v. 4 and
         assembled in one directory which has the same name as the document's ARK. (ex. 'bpt6k10516302/')
 
     Args:
         ordered_files (list): names of ALTO files in the directory
         directory (path): path to directory containing ALTO-encoded transcriptions of the document's pages
+        tolerance (float): maximum deviation in pixels when simplifying polygons and baselines, None to keep every point
+        compression (string): "gzip" or "zstd" to compress the output file, None to write plain XML
+        shard_dir (path): directory in which to write one fragment per folio and an XInclude master, None to write one file
+        reading_order (boolean): if True, order the <body>'s lines by the position of columns and lines on each page
+        normaliser (dict): compiled normalisation table applied to the <body>'s lines, None to keep the diplomatic text
     """    
     print("=====================================")
     print(f"\33[32m~ now processing {os.path.basename(directory)} ~\x1b[0m")
@@ -56,7 +69,8 @@ def make_tei(ordered_files, directory):
     # -- SOURCEDOC --
     print(f"\33[33mcreating <sourceDoc>\x1b[0m")
     t0 = datetime.utcnow()
-    root = sourcedoc(ordered_files, directory, root)
+    stats = new_stats()
+    root = sourcedoc(ordered_files, directory, root, tolerance, stats)
     t1 = datetime.utcnow()
     dif = t1-t0
     print(f"|________finished in {dif.seconds}.{dif.microseconds} seconds")
@@ -65,21 +79,98 @@ def make_tei(ordered_files, directory):
     # -- BODY --
     print(f"\33[33mcreating <body>\x1b[0m")
     t0 = datetime.utcnow()
-    root = body(root)
+    root = body(root, reading_order, normaliser)
     t1 = datetime.utcnow()
     dif = t1-t0
     print(f"|________finished in {dif.seconds}.{dif.microseconds} seconds")
     print("")
-    
-    with open(f'data/{os.path.basename(directory)}.xml', 'wb') as f:
-        etree.ElementTree(root).write(f, encoding="utf-8", xml_declaration=True, pretty_print=True)
+
+    # -- OUTPUT --
+    if shard_dir:
+        print(f"\33[33mwriting fragments to {shard_dir}\x1b[0m")
+        t0 = datetime.utcnow()
+        written, unchanged = write_shards(root, shard_dir, os.path.basename(directory))
+        t1 = datetime.utcnow()
+        dif = t1-t0
+        print(f"|________finished in {dif.seconds}.{dif.microseconds} seconds")
+        print(f"|        {written} fragments written, {unchanged} unchanged")
+        print("")
+        return
+    print(f"\33[33mwriting {EXTENSIONS[compression]}\x1b[0m")
+    t0 = datetime.utcnow()
+    size, compressed_size = write_tei(root, f"data/{os.path.basename(directory)}{EXTENSIONS[compression]}", compression)
+    t1 = datetime.utcnow()
+    dif = t1-t0
+    print(f"|________finished in {dif.seconds}.{dif.microseconds} seconds")
+    report_savings(stats, size, compressed_size, tolerance, compression)
+    print("")
+
+
+def write_tei(root, path, compression=None):
+    """Serializes the XML-TEI tree and writes it, compressed or not, to the given path.
+
+    Args:
+        root (etree._Element): etree element for the document's XML-TEI file
+        path (path): path of the output file
+        compression (string): "gzip" or "zstd" to compress the output file, None to write plain XML
+
+    Returns:
+        size (int): size in bytes of the serialized XML
+        compressed_size (int): size in bytes of the file written to disk
+    """
+    xml = etree.tostring(root, encoding="UTF-8", xml_declaration=True, pretty_print=True)
+    if compression == "gzip":
+        data = gzip.compress(xml, mtime=0)
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("zstd compression requires the zstandard package (pip install zstandard)")
+        data = zstandard.ZstdCompressor(level=19).compress(xml)
+    else:
+        data = xml
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(xml), len(data)
+
+
+def report_savings(stats, size, compressed_size, tolerance, compression):
+    """Prints the reduction in points and bytes obtained by the geometry simplification and the compression.
+
+    Args:
+        stats (dict): counters of points and characters before and after simplification
+        size (int): size in bytes of the serialized XML
+        compressed_size (int): size in bytes of the file written to disk
+        tolerance (float): tolerance used for the simplification, or None
+        compression (string): compression used for the output file, or None
+    """
+    def percent(before, after):
+        return f"{100*(before-after)/before:.1f}%" if before else "0.0%"
+
+    if tolerance:
+        # every character removed from a @points attribute is one byte less in the UTF-8 output
+        unsimplified = size + stats["chars_before"] - stats["chars_after"]
+        print(f"|        simplified geometry with a tolerance of {tolerance}px: {stats['points_before']} -> {stats['points_after']} points (-{percent(stats['points_before'], stats['points_after'])}), {unsimplified} -> {size} bytes (-{percent(unsimplified, size)})")
+    if compression:
+        print(f"|        compressed with {compression}: {size} -> {compressed_size} bytes (-{percent(size, compressed_size)})")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        directories = [path for path in sys.argv[1:] if os.path.isdir(path)]  # create a list of directories in data/*
+    parser = argparse.ArgumentParser(description="Transform a document's ALTO files into one XML-TEI file.")
+    parser.add_argument("paths", nargs="*", help="directories named after each document's ark, ex. data/bpt6k10516302")
+    parser.add_argument("--tolerance", type=float, default=None, help="simplify polygons and baselines to within this many pixels")
+    parser.add_argument("--compress", choices=["gzip", "zstd"], default=None, help="compress the output file")
+    parser.add_argument("--shard", metavar="DIR", default=None, help="write one fragment per folio and an XInclude master to DIR (outside data/)")
+    parser.add_argument("--reading-order", action="store_true", help="order the <body> by column and line position and report misassigned or overlapping lines")
+    parser.add_argument("--normalise", metavar="TABLE", nargs="?", const=TABLE, default=None, help="apply a normalisation table (default: normalisation.tsv) to the <body>'s lines")
+    args = parser.parse_args()
+    if args.shard and args.compress:
+        parser.error("--shard cannot be combined with --compress")
+    directories = [path for path in args.paths if os.path.isdir(path)]  # create a list of directories in data/*
+    normaliser = compile_table(load_table(args.normalise)) if args.normalise else None
+    if len(directories) > 0:
         for directory in directories:  # create XML-TEI file for each directory / document
             ordered_files = order_files(directory)
-            make_tei(ordered_files, directory)
+            make_tei(ordered_files, directory, args.tolerance, args.compress, args.shard, args.reading_order, normaliser)
     else:
         print("No directory given")
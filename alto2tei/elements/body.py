@@ -1,19 +1,43 @@
 from lxml import etree
 
-def body(root):
+from normalisation import normalise
+
+from .spatial import page_index, check_lines, reading_order as order_lines
+
+def body(root, reading_order=False, normaliser=None):
+    """Creates the <body> from the <line> elements of every MainZone's DefaultLines in the <sourceDoc>.
+
+    Args:
+        root (etree._Element): etree element for the document's XML-TEI file
+        reading_order (boolean): if True, order each page's MainZone columns and lines by their position
+            and report misassigned or overlapping lines; otherwise keep the order of the ALTO files
+        normaliser (dict): compiled normalisation table applied to the text of each <l>, None to keep the diplomatic text
+
+    Returns:
+        root (etree._Element): etree element for the document's XML-TEI file
+    """
     text = etree.SubElement(root, "text")
     body = etree.SubElement(text, "body")
     for page in root.findall('.//surface'):
         surface_id = ["{http://www.w3.org/XML/1998/namespace}id",page.get("{http://www.w3.org/XML/1998/namespace}id")]
         etree.SubElement(body, "pb", corresp=surface_id[1])
-        for string in page.findall(f'.//line'):
-            block = string.getparent().getparent().get("type")
-            line = string.getparent().get("type")
-            if block == "MainZone":
-                if line == "DefaultLine":
-                    l = etree.SubElement(body, "l", corresp=string.get("{http://www.w3.org/XML/1998/namespace}id"))
-                    l.text = string.text
+        if reading_order:
+            index = page_index(page)
+            misassigned, overlapping = check_lines(index)
+            for line_id, block_id, container_id in misassigned:
+                print(f"|        {line_id} is encoded in {block_id} but lies in {container_id}")
+            for line_id, other_id in overlapping:
+                print(f"|        {line_id} overlaps {other_id}")
+            strings = [line["element"].find("line") for line in order_lines(index) if line["type"] == "DefaultLine"]
+        else:
+            strings = [string for string in page.findall(f'.//line') \
+                        if string.getparent().getparent().get("type") == "MainZone" \
+                        and string.getparent().get("type") == "DefaultLine"]
+        for string in strings:
+            if string is not None:
+                l = etree.SubElement(body, "l", corresp=string.get("{http://www.w3.org/XML/1998/namespace}id"))
+                l.text = normalise(string.text, normaliser) if normaliser else string.text
 
 
 
-    return root
\ No newline at end of file
+    return root
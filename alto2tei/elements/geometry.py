@@ -0,0 +1,134 @@
+import math
+import re
+
+
+def parse_points(points):
+    """Parses an ALTO @POINTS or @BASELINE value into a list of coordinates.
+
+    Args:
+        points (string): space-separated coordinates, ex. "678 1998 678 3539 2762 3539"
+
+    Returns:
+        coordinates (list): (x, y) tuples of integers
+    """
+    return [tuple(int(n) for n in pair.split()) for pair in re.findall(r"(\d+ \d+)", points)]
+
+
+def format_points(coordinates):
+    """Formats a list of coordinates as the value of a TEI @points attribute.
+
+    Args:
+        coordinates (list): (x, y) tuples of integers
+
+    Returns:
+        points (string): comma-joined pairs separated by spaces, ex. "678,1998 678,3539 2762,3539"
+    """
+    return " ".join([f"{x},{y}" for x, y in coordinates])
+
+
+def distance_to_segment(point, start, end):
+    """Calculates the perpendicular distance in pixels between a point and the segment [start, end].
+
+    Args:
+        point (tuple): (x, y) coordinates of the point
+        start (tuple): (x, y) coordinates of the segment's first point
+        end (tuple): (x, y) coordinates of the segment's last point
+
+    Returns:
+        distance (float): distance from the point to the nearest point of the segment
+    """
+    dx, dy = end[0]-start[0], end[1]-start[1]
+    if dx == 0 and dy == 0:
+        return math.hypot(point[0]-start[0], point[1]-start[1])
+    t = ((point[0]-start[0])*dx + (point[1]-start[1])*dy) / (dx*dx + dy*dy)
+    t = max(0, min(1, t))
+    return math.hypot(point[0]-(start[0]+t*dx), point[1]-(start[1]+t*dy))
+
+
+def douglas_peucker(coordinates, tolerance):
+    """Simplifies an open line with the Douglas-Peucker algorithm. The line's first and last points are
+        always kept, and every removed point lies within the tolerance of the simplified line.
+
+    Args:
+        coordinates (list): (x, y) tuples of the line
+        tolerance (float): maximum distance in pixels between a removed point and the simplified line
+
+    Returns:
+        simplified (list): (x, y) tuples of the simplified line
+    """
+    if len(coordinates) < 3:
+        return list(coordinates)
+    keep = [False]*len(coordinates)
+    keep[0] = keep[-1] = True
+    # an explicit stack avoids Python's recursion limit on very long polygons
+    stack = [(0, len(coordinates)-1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance, index = 0, None
+        for i in range(first+1, last):
+            d = distance_to_segment(coordinates[i], coordinates[first], coordinates[last])
+            if d > max_distance:
+                max_distance, index = d, i
+        if index is not None and max_distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [c for c, k in zip(coordinates, keep) if k]
+
+
+def simplify_polygon(coordinates, tolerance):
+    """Simplifies a closed polygon. The ring is cut at the point farthest from its first point and
+        each half is simplified as an open line, so that the polygon keeps at least 3 points.
+
+    Args:
+        coordinates (list): (x, y) tuples of the polygon
+        tolerance (float): maximum distance in pixels between a removed point and the simplified polygon
+
+    Returns:
+        simplified (list): (x, y) tuples of the simplified polygon
+    """
+    if len(coordinates) < 4:
+        return list(coordinates)
+    origin = coordinates[0]
+    split = max(range(len(coordinates)), key=lambda i: math.hypot(coordinates[i][0]-origin[0], coordinates[i][1]-origin[1]))
+    first_half = douglas_peucker(coordinates[:split+1], tolerance)
+    second_half = douglas_peucker(coordinates[split:]+[origin], tolerance)
+    simplified = first_half + second_half[1:-1]
+    if len(simplified) < 3:
+        return list(coordinates)
+    return simplified
+
+
+def simplify(points, tolerance, closed, stats=None):
+    """Simplifies an ALTO @POINTS or @BASELINE value and formats it for a TEI @points attribute.
+
+    Args:
+        points (string): space-separated coordinates from the ALTO file
+        tolerance (float): maximum deviation in pixels, or None to keep every point
+        closed (boolean): True for a polygon, False for a baseline
+        stats (dict): optional counters of points and characters before and after simplification
+
+    Returns:
+        points (string): value of the TEI @points attribute
+    """
+    coordinates = parse_points(points)
+    if tolerance:
+        simplified = simplify_polygon(coordinates, tolerance) if closed else douglas_peucker(coordinates, tolerance)
+    else:
+        simplified = coordinates
+    formatted = format_points(simplified)
+    if stats is not None:
+        stats["points_before"] += len(coordinates)
+        stats["points_after"] += len(simplified)
+        stats["chars_before"] += len(format_points(coordinates))
+        stats["chars_after"] += len(formatted)
+    return formatted
+
+
+def new_stats():
+    """Creates the counters updated by simplify().
+
+    Returns:
+        stats (dict): counters of points and characters before and after simplification
+    """
+    return {"points_before":0, "points_after":0, "chars_before":0, "chars_after":0}
@@ -1,13 +1,14 @@
 import os
 import re
-from collections import defaultdict
 
 from lxml import etree
 
-NS = {'a':"http://www.loc.gov/standards/alto/ns-v4#"}  # namespace for the Alto xml
+from altocache import load_page
 
+from .geometry import simplify
 
-def sourcedoc(ordered_files, dir, tei_root):
+
+def sourcedoc(ordered_files, dir, tei_root, tolerance=None, stats=None):
     """Creates the <sourceDoc> for an XML-TEI file using data parsed from a series of ALTO files.
         The <sourceDoc> collates each ALTO file, which represents one page of a document, into a wholistic
         description of the facsimile of the document.
@@ -16,9 +17,14 @@ def sourcedoc(ordered_files, dir, tei_root):
         ordered_files (list): names of ALTO files in the directory
         directory (path): path to document directory
         tei_root (etree._Element): etree element for the docuemnts'XML-TEI file
+        tolerance (float): maximum deviation in pixels when simplifying polygons and baselines, None to keep every point
+        stats (dict): optional counters of points and characters before and after simplification
     """
+    # get the page model of every ALTO file, parsed once and cached between runs
+    pages = [load_page(f"{dir}/{file}") for file in ordered_files]
+
     # get dictionary of tags from this document
-    tag_dict = tags(ordered_files, dir)
+    tag_dict = tags(pages)
     
     # create <sourceDoc> and its child <surfaceGrp>
     sourceDoc = etree.SubElement(tei_root, "sourceDoc")
@@ -26,17 +32,16 @@ def sourcedoc(ordered_files, dir, tei_root):
 
     # -- SURFACE --
     # for every page in the document, create a <surface> and assign to it attributes derived from the ALTO file
-    for file in ordered_files:
+    for file, page in zip(ordered_files, pages):
         folio = re.search(r"(.*f)(\d+)", file).group(2)  # get folio number from file name
-        alto_root = etree.parse(f"{dir}/{file}").getroot()
-        surface = etree.SubElement(surfaceGrp, "surface", page_attributes(alto_root, folio))
+        surface = etree.SubElement(surfaceGrp, "surface", page_attributes(page, folio))
         
         # create <graphic> and assign its attributes
         etree.SubElement(surface, "graphic", url=f"https://gallica.bnf.fr/iiif/ark:/12148/{os.path.basename(dir)}/f{folio}/full/full/0/native.jpg")
 
         # -- TEXTBLOCK --
         # for every <Page> in this ALTO file, create a <zone> for every <TextBlock> and assign the latter's attributes
-        block_att, processed_blocks = zone_attributes(alto_root, dir, tag_dict, folio, "PrintSpace/", "TextBlock")
+        block_att, processed_blocks = zone_attributes([b for b in page["blocks"] if b["printspace"]], dir, tag_dict, folio, tolerance, stats)
         lines_in_doc = 0
         for i in range(len(processed_blocks)):
             xml_id = {"{http://www.w3.org/XML/1998/namespace}id":f"f{folio}_z{i+1}"}
@@ -46,7 +51,7 @@ def sourcedoc(ordered_files, dir, tei_root):
 
             # -- TEXTLINE --
             # for every <TextBlock> in this ALTO file that has at least one <TextLine>, create a <zone> and assign its attributes
-            text_line_att, processed_lines = zone_attributes(alto_root, dir, tag_dict, folio, f'TextBlock[@ID="{processed_blocks[i]}"]/', "TextLine")
+            text_line_att, processed_lines = zone_attributes(processed_blocks[i]["lines"], dir, tag_dict, folio, tolerance, stats)
             if len(processed_lines) > 0:                
                 for j in range(len(processed_lines)):
                     xml_id = {"{http://www.w3.org/XML/1998/namespace}id":f"f{folio}_z{i+1}_l{j+1}"}
@@ -59,95 +64,84 @@ def sourcedoc(ordered_files, dir, tei_root):
                     # -- PATH --
                     xml_id = {"{http://www.w3.org/XML/1998/namespace}id":f"f{folio}_z{i+1}_l{j+1}_p"}
                     baseline = etree.SubElement(text_line, "path", xml_id)
-                    b = alto_root.find(f'.//a:TextLine[@ID="{processed_lines[j]}"]', namespaces=NS).get("BASELINE")
-                    baseline.attrib["points"] = " ".join([re.sub(r"\s", ",", x) for x in re.findall(r"(\d+ \d+)", b)])
+                    baseline.attrib["points"] = simplify(processed_lines[j]["baseline"], tolerance, closed=False, stats=stats)
 
                     # -- LINE --
                     # for every <TextLine> in this ALTO file that has a <String>, create a <line>
-                    if alto_root.find(f'.//a:TextLine[@ID="{processed_lines[j]}"]/a:String', namespaces=NS).get("CONTENT") is not None:
+                    strings = processed_lines[j]["strings"]
+                    if len(strings) > 0 and strings[0] is not None:
                         xml_id = {"{http://www.w3.org/XML/1998/namespace}id":f"f{folio}_z{i+1}_l{j+1}t"}
                         string = etree.SubElement(text_line, "line", xml_id)
-                        string.text = alto_root.find(f'.//a:TextLine[@ID="{processed_lines[j]}"]/a:String', namespaces=NS).get("CONTENT")
+                        string.text = strings[0]
     return tei_root
 
 
-def tags(ordered_files, dir):
+def tags(pages):
     """Creates a dictionary of a tag's ID (key) and its LABEL (value).
         The IDs are unique to each document and must be recalculated for each directory.
 
     Args:
-        ordered_files (list): list of file names in a directory ordered by folio number
-        dir (path): path to document directory
+        pages (list): page models of the document's ALTO files ordered by folio number
 
     Returns:
         tags_dict (dict): tag-value pairs
     """    
-    root = etree.parse(f"{dir}/{ordered_files[0]}").getroot()
-    tags = [t.attrib for t in root.findall('.//a:OtherTag', namespaces=NS)]
-    collect = defaultdict(dict)
-    for d in tags:
-        collect[d["ID"]] = d["LABEL"]
-    tags_dict = dict(collect)
-    return tags_dict
+    return dict(pages[0]["tags"])
 
 
-def page_attributes(root, folio):
-    """Parses the ALTO file's <Page> attributes and synthesizes those data with 
-        data from file paths to derive attributes for <surface> in the XML-TEI file.
+def page_attributes(page, folio):
+    """Synthesizes the ALTO file's <Page> attributes with data from file paths
+        to derive attributes for <surface> in the XML-TEI file.
 
     Args:
-        root (etree._Element): etree of the ALTO file
-        dir (path): path to document directory
+        page (dict): page model of the ALTO file
         folio (string): folio number in ALTO file name
 
     Returns:
         page_attributes (dictionary): attributes to be applied to TEI <surface>
     """    
-    att_list = root.find('.//a:Page', namespaces=NS).attrib
     page_attributes = {
         "{http://www.w3.org/XML/1998/namespace}id":f"f{folio}",
-        "n":att_list["PHYSICAL_IMG_NR"],
+        "n":page["physical_img_nr"],
         "ulx":"0",
         "uly":"0",
-        "lrx":att_list["WIDTH"],
-        "lry":att_list["HEIGHT"]
+        "lrx":page["width"],
+        "lry":page["height"]
     }
     return page_attributes
 
 
-def zone_attributes(alto_root, dir, tags, folio, parent, zone):
-    """Parses attribute data from zone-like elements in ALTO file (TextBlock, TextLine) and prepares an attribute dictionary
-        for a TEI <zone> element. It also records the ALTO @ID of the block processed which can be referenced later while 
-        parsing data ALTO file to create the zone's children.
+def zone_attributes(zones, dir, tags, folio, tolerance=None, stats=None):
+    """Prepares an attribute dictionary for a TEI <zone> element from the zone-like elements of an ALTO file (TextBlock, TextLine).
+        It also returns the zones processed, whose children (lines, baseline, text) are used later
+        to create the zone's children.
 
     Args:
-        alto_root (etree._Element): etree of the ALTO file
+        zones (list): blocks or lines from the ALTO file's page model
         dir (path): path to document directory
         tags (dictionary): tag ID and LABEL for the document
         folio (string): folio number extracted from the ALTO file name
-        parent (string): Xpath of the zone-like element's parent in the ALTO file
-        zone (string): Xpath of the zone-like element in the ALTO file
+        tolerance (float): maximum deviation in pixels when simplifying the polygon, None to keep every point
+        stats (dict): optional counters of points and characters before and after simplification
 
     Returns:
         block_attributes (list): list of attribute dictionaries for each parsed zone-like element
-        processed_blocks (list): list of @IDs for each parsed zone-like element
+        processed_blocks (list): list of the zones for which attributes were prepared
     """     
-    zone_elements = [z for z in alto_root.findall(f'.//a:{parent}a:{zone}', namespaces=NS) \
-                        if z.attrib['TAGREFS']!="BT" \
-                        and z.attrib['TAGREFS']!="LT"]
+    zone_elements = [z for z in zones \
+                        if z["tagrefs"]!="BT" \
+                        and z["tagrefs"]!="LT"]
                         # these conditions ignore any zone-like element whose tag is invalid
-    att_list = [z.attrib for z in zone_elements]
-    points = [z.find('.//a:Polygon', namespaces=NS).attrib for z in zone_elements]
     block_attributes = []
     processed_blocks = []
-    for i in range(len(zone_elements)):
-        tag_parts = re.match(r"(\w+):?(\w+)?#?(\d?)?", str(tags[att_list[i]["TAGREFS"]]))
+    for z in zone_elements:
+        tag_parts = re.match(r"(\w+):?(\w+)?#?(\d?)?", str(tags[z["tagrefs"]]))
         # the 3 groups of this regex parse the following expected tag syntax: MainZone:column#1 --> (MainZone)(column)(1)
-        zone_points = " ".join([re.sub(r"\s", ",", x) for x in re.findall(r"(\d+ \d+)", points[i]["POINTS"])])
-        x = att_list[i]["HPOS"]
-        y = att_list[i]["VPOS"]
-        w = att_list[i]["WIDTH"]
-        h = att_list[i]["HEIGHT"]
+        zone_points = simplify(z["points"], tolerance, closed=True, stats=stats)
+        x = z["hpos"]
+        y = z["vpos"]
+        w = z["width"]
+        h = z["height"]
         zone_att = {
             "type":tag_parts.group(1),
             "subtype":tag_parts.group(2) or "none",
@@ -156,6 +150,5 @@ def zone_attributes(alto_root, dir, tags, folio, parent, zone):
             "source":f"https://gallica.bnf.fr/iiif/ark:/12148/{os.path.basename(dir)}/f{folio}/{x},{y},{w},{h}/full/0/native.jpg"
         }
         block_attributes.append(zone_att)
-        processed_blocks.append(att_list[i]["ID"])
+        processed_blocks.append(z)
     return block_attributes, processed_blocks
-    
\ No newline at end of file
@@ -0,0 +1,245 @@
+from collections import defaultdict
+
+from .geometry import parse_points
+
+XML_ID = "{http://www.w3.org/XML/1998/namespace}id"
+CELL = 256  # side in pixels of a cell of the grid index
+OVERLAP = 0.5  # share of the smaller bounding box above which two lines are reported as overlapping
+
+
+def page_index(surface):
+    """Builds a grid index of the text blocks and lines of one <surface> from their @points.
+        Each zone is registered in every cell of the grid that its bounding box touches, so that
+        queries only compare the zones found in the cells they touch.
+
+    Args:
+        surface (etree._Element): a <surface> created by sourcedoc()
+
+    Returns:
+        index (dict): blocks, lines, and the grids which map a cell (column, row) to the positions of blocks and lines
+    """
+    blocks, lines = [], []
+    for block in surface.findall("zone"):
+        polygon = [tuple(int(n) for n in p.split(",")) for p in block.get("points").split()]
+        blocks.append({
+            "id":block.get(XML_ID),
+            "type":block.get("type"),
+            "polygon":polygon,
+            "bbox":bbox(polygon),
+            "element":block
+        })
+        for line in block.findall("zone"):
+            polygon = [tuple(int(n) for n in p.split(",")) for p in line.get("points").split()]
+            path = line.find("path")
+            baseline = [tuple(int(n) for n in p.split(",")) for p in path.get("points").split()] if path is not None else []
+            lines.append({
+                "id":line.get(XML_ID),
+                "type":line.get("type"),
+                "block":len(blocks)-1,
+                "polygon":polygon,
+                "bbox":bbox(polygon),
+                "anchor":anchor(baseline, polygon),
+                "element":line
+            })
+    return {"blocks":blocks, "lines":lines, "block_grid":grid(blocks), "line_grid":grid(lines)}
+
+
+def bbox(polygon):
+    """Calculates a polygon's bounding box.
+
+    Args:
+        polygon (list): (x, y) tuples
+
+    Returns:
+        bbox (tuple): (left, top, right, bottom)
+    """
+    xs = [x for x, _ in polygon]
+    ys = [y for _, y in polygon]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def anchor(baseline, polygon):
+    """Chooses the point which represents a line when testing which block contains it:
+        the middle of the baseline, or the centre of the polygon's bounding box if there is no baseline.
+
+    Args:
+        baseline (list): (x, y) tuples of the baseline
+        polygon (list): (x, y) tuples of the line's polygon
+
+    Returns:
+        point (tuple): (x, y)
+    """
+    if len(baseline) > 0:
+        return ((baseline[0][0]+baseline[-1][0])/2, (baseline[0][1]+baseline[-1][1])/2)
+    left, top, right, bottom = bbox(polygon)
+    return ((left+right)/2, (top+bottom)/2)
+
+
+def cells(box):
+    """Lists the cells of the grid touched by a bounding box.
+
+    Args:
+        box (tuple): (left, top, right, bottom)
+
+    Returns:
+        cells (list): (column, row) tuples
+    """
+    left, top, right, bottom = box
+    return [(c, r) for c in range(int(left)//CELL, int(right)//CELL+1) for r in range(int(top)//CELL, int(bottom)//CELL+1)]
+
+
+def grid(zones):
+    """Registers zones in every cell touched by their bounding box.
+
+    Args:
+        zones (list): dictionaries with a "bbox"
+
+    Returns:
+        grid (dict): positions of the zones in each cell
+    """
+    g = defaultdict(list)
+    for i, zone in enumerate(zones):
+        for cell in cells(zone["bbox"]):
+            g[cell].append(i)
+    return g
+
+
+def candidates(g, box):
+    """Collects the positions of the zones registered in the cells touched by a bounding box.
+
+    Args:
+        g (dict): grid built by grid()
+        box (tuple): (left, top, right, bottom)
+
+    Returns:
+        positions (set): positions of the zones which may intersect the box
+    """
+    return {i for cell in cells(box) for i in g.get(cell, [])}
+
+
+def point_in_polygon(point, polygon):
+    """Tests whether a point lies inside a polygon with the even-odd rule.
+
+    Args:
+        point (tuple): (x, y)
+        polygon (list): (x, y) tuples
+
+    Returns:
+        inside (boolean): True if the point is inside the polygon
+    """
+    x, y = point
+    inside = False
+    j = len(polygon)-1
+    for i in range(len(polygon)):
+        xi, yi = polygon[i]
+        xj, yj = polygon[j]
+        if (yi > y) != (yj > y) and x < (xj-xi)*(y-yi)/(yj-yi)+xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def zone_containing(index, x, y):
+    """Finds the text block whose polygon contains a point.
+
+    Args:
+        index (dict): page index built by page_index()
+        x (float): horizontal coordinate in pixels
+        y (float): vertical coordinate in pixels
+
+    Returns:
+        block (dict): the smallest block containing the point, or None
+    """
+    found = [index["blocks"][i] for i in candidates(index["block_grid"], (x, y, x, y)) \
+                if point_in_polygon((x, y), index["blocks"][i]["polygon"])]
+    if len(found) == 0:
+        return None
+    return min(found, key=lambda b: area(b["bbox"]))
+
+
+def lines_in_region(index, points):
+    """Finds the lines whose anchor lies inside a region.
+
+    Args:
+        index (dict): page index built by page_index()
+        points (string): the region's polygon, as a TEI @points or ALTO @POINTS value
+
+    Returns:
+        lines (list): lines inside the region, in the order of the <surface>
+    """
+    polygon = parse_points(points.replace(",", " "))
+    return [index["lines"][i] for i in sorted(candidates(index["line_grid"], bbox(polygon))) \
+                if point_in_polygon(index["lines"][i]["anchor"], polygon)]
+
+
+def area(box):
+    """Calculates the area of a bounding box, or 0 if it is empty."""
+    return max(0, box[2]-box[0])*max(0, box[3]-box[1])
+
+
+def intersection(a, b):
+    """Calculates the area shared by two bounding boxes."""
+    return area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+
+
+def check_lines(index):
+    """Detects lines whose anchor lies inside another block than the one they are encoded in,
+        and pairs of lines whose bounding boxes largely overlap.
+
+    Args:
+        index (dict): page index built by page_index()
+
+    Returns:
+        misassigned (list): (line id, id of the block it is in, id of the block containing it) tuples
+        overlapping (list): (line id, line id) tuples
+    """
+    misassigned = []
+    overlapping = []
+    for i, line in enumerate(index["lines"]):
+        parent = index["blocks"][line["block"]]
+        if not point_in_polygon(line["anchor"], parent["polygon"]):
+            container = zone_containing(index, *line["anchor"])
+            if container is not None:
+                misassigned.append((line["id"], parent["id"], container["id"]))
+        for j in sorted(candidates(index["line_grid"], line["bbox"])):
+            if j > i:
+                other = index["lines"][j]
+                smaller = min(area(line["bbox"]), area(other["bbox"]))
+                if smaller > 0 and intersection(line["bbox"], other["bbox"]) > OVERLAP*smaller:
+                    overlapping.append((line["id"], other["id"]))
+    return misassigned, overlapping
+
+
+def reading_order(index, block_type="MainZone"):
+    """Orders a page's blocks of one type into columns and returns their lines in reading order.
+        Blocks whose horizontal extents overlap by more than half of the narrower one belong to the same column;
+        columns are read from left to right, blocks from top to bottom, and lines by the height of their anchor.
+
+    Args:
+        index (dict): page index built by page_index()
+        block_type (string): @type of the blocks to order
+
+    Returns:
+        lines (list): the lines of the blocks, in reading order
+    """
+    blocks = sorted([i for i, b in enumerate(index["blocks"]) if b["type"] == block_type], \
+                    key=lambda i: index["blocks"][i]["bbox"][0])
+    columns = []  # [left, right, positions of the blocks]
+    for i in blocks:
+        left, _, right, _ = index["blocks"][i]["bbox"]
+        if len(columns) > 0:
+            c_left, c_right, members = columns[-1]
+            overlap = min(right, c_right)-max(left, c_left)
+            if overlap > 0.5*min(right-left, c_right-c_left):
+                columns[-1] = [min(left, c_left), max(right, c_right), members+[i]]
+                continue
+        columns.append([left, right, [i]])
+
+    lines_by_block = defaultdict(list)
+    for line in index["lines"]:
+        lines_by_block[line["block"]].append(line)
+    ordered = []
+    for _, _, members in columns:
+        for i in sorted(members, key=lambda i: index["blocks"][i]["bbox"][1]):
+            ordered.extend(sorted(lines_by_block[i], key=lambda l: l["anchor"][1]))
+    return ordered
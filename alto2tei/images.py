@@ -0,0 +1,178 @@
+import argparse
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+
+from alto2tei import order_files
+
+SERVER = "https://gallica.bnf.fr/iiif"  # IIIF Image API endpoint used by sourcedoc() for <graphic> and <zone> @source
+CHUNK = 64*1024  # bytes read from the response at a time
+RETRIES = 3  # attempts per image before giving up
+
+
+def rate_limiter(per_second):
+    """Creates a function which spaces out the requests sent to each host by a minimum interval, across every worker thread.
+
+    Args:
+        per_second (float): maximum number of requests per second to each host, or 0 for no limit
+
+    Returns:
+        wait (function): blocks until a request to the host of the URL it is given is allowed
+    """
+    interval = 1/per_second if per_second else 0
+    next_slot = {}
+    lock = threading.Lock()
+
+    def wait(url):
+        host = urlparse(url).netloc
+        with lock:
+            now = time.monotonic()
+            slot = max(now, next_slot.get(host, now))
+            next_slot[host] = slot+interval
+        if slot > now:
+            time.sleep(slot-now)
+
+    return wait
+
+
+def image_url(server, ark, folio):
+    """Builds the IIIF URL of a page's full-size image, as written by sourcedoc() in <graphic>.
+
+    Args:
+        server (string): base URL of the IIIF Image API
+        ark (string): the document's ark, ex. 'bpt6k10516302'
+        folio (string): folio number from the ALTO file name
+
+    Returns:
+        url (string): URL of the image
+    """
+    return f"{server}/ark:/12148/{ark}/f{folio}/full/full/0/native.jpg"
+
+
+def missing_images(directory, server=SERVER):
+    """Lists the page images of a document which are not yet beside its ALTO files.
+        Each image is named after its ALTO file, ex. 'bpt6k10516302_f10.xml' -> 'bpt6k10516302_f10.jpg'.
+
+    Args:
+        directory (path): path to directory containing ALTO-encoded transcriptions of the document's pages
+        server (string): base URL of the IIIF Image API
+
+    Returns:
+        missing (list): (url, path) tuples of the images to download, ordered by folio number
+    """
+    ark = os.path.basename(os.path.normpath(directory))
+    missing = []
+    for file in order_files(directory):
+        folio = re.search(r"(.*f)(\d+)", file).group(2)
+        path = os.path.join(directory, file[:-len(".xml")]+".jpg")
+        if not os.path.isfile(path):
+            missing.append((image_url(server, ark, folio), path))
+    return missing
+
+
+def download(url, path, session, limiter):
+    """Downloads one image to path. Bytes are written to 'path.part', which is resumed with a Range request
+        if a previous attempt was interrupted, and renamed to path once its size matches the size announced by the server.
+
+    Args:
+        url (string): URL of the image
+        path (path): where to write the image
+        session (requests.Session): the worker's session, whose connections are reused between images
+        limiter (function): rate limiter shared by the workers, created by rate_limiter()
+
+    Returns:
+        size (int): size in bytes of the downloaded image
+    """
+    part = path+".part"
+    for attempt in range(RETRIES):
+        offset = os.path.getsize(part) if os.path.isfile(part) else 0
+        headers = {"Range":f"bytes={offset}-"} if offset else {}
+        limiter(url)
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=60) as r:
+                if r.status_code == 416:  # the part file is already complete or invalid: start again
+                    os.remove(part)
+                    continue
+                if r.status_code == 429 or r.status_code >= 500:
+                    raise requests.HTTPError(f"{r.status_code} {r.reason}", response=r)
+                r.raise_for_status()
+                if r.status_code == 206:
+                    expected = int(r.headers["Content-Range"].split("/")[-1])
+                    mode = "ab"
+                else:  # the server ignored the Range header and sends the whole image
+                    expected = int(r.headers["Content-Length"]) if "Content-Length" in r.headers else None
+                    mode = "wb"
+                with open(part, mode) as f:
+                    for chunk in r.iter_content(CHUNK):
+                        f.write(chunk)
+        except requests.RequestException as error:  # includes connections cut in the middle of the body
+            if isinstance(error, requests.HTTPError) and error.response is not None \
+                    and error.response.status_code < 500 and error.response.status_code != 429:
+                raise
+            time.sleep(2**attempt)
+            continue
+        size = os.path.getsize(part)
+        if expected is not None and size != expected:
+            continue  # the connection was cut short: resume from what was written
+        os.replace(part, path)
+        return size
+    raise IOError(f"could not download {url} after {RETRIES} attempts")
+
+
+def download_images(directory, server=SERVER, workers=4, per_second=2):
+    """Downloads a document's missing page images with a bounded number of concurrent workers.
+
+    Args:
+        directory (path): path to directory containing ALTO-encoded transcriptions of the document's pages
+        server (string): base URL of the IIIF Image API
+        workers (int): maximum number of simultaneous downloads
+        per_second (float): maximum number of requests per second to each host
+
+    Returns:
+        downloaded (int): number of images downloaded
+        failed (list): URLs which could not be downloaded
+    """
+    missing = missing_images(directory, server)
+    limiter = rate_limiter(per_second)
+    local = threading.local()
+
+    def task(url, path):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return download(url, path, local.session, limiter)
+
+    downloaded, failed = 0, []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(task, url, path):(url, path) for url, path in missing}
+        for future in as_completed(futures):
+            url, path = futures[future]
+            try:
+                size = future.result()
+                downloaded += 1
+                print(f"|        {os.path.basename(path)} ({size} bytes)")
+            except (IOError, requests.RequestException) as error:
+                failed.append(url)
+                print(f"|        \33[31mfailed\x1b[0m {url}: {error}")
+    return downloaded, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the IIIF page images missing beside a document's ALTO files.")
+    parser.add_argument("paths", nargs="*", help="directories named after each document's ark, ex. data/bpt6k10516302")
+    parser.add_argument("--server", default=SERVER, help=f"base URL of the IIIF Image API (default: {SERVER})")
+    parser.add_argument("--workers", type=int, default=4, help="maximum number of simultaneous downloads (default: 4)")
+    parser.add_argument("--rate", type=float, default=2, help="maximum number of requests per second to each host (default: 2)")
+    args = parser.parse_args()
+    directories = [path for path in args.paths if os.path.isdir(path)]
+    if len(directories) > 0:
+        for directory in directories:
+            print(f"\33[32m~ now downloading images for {os.path.basename(os.path.normpath(directory))} ~\x1b[0m")
+            downloaded, failed = download_images(directory, args.server.rstrip("/"), args.workers, args.rate)
+            print(f"|________{downloaded} images downloaded, {len(failed)} failed")
+    else:
+        print("No directory given")
@@ -0,0 +1,167 @@
+import os
+import sys
+
+from lxml import etree
+
+TEI = "http://www.tei-c.org/ns/1.0"  # XML-TEI namespace
+XI = "http://www.w3.org/2001/XInclude"  # XInclude namespace
+XML_ID = "{http://www.w3.org/XML/1998/namespace}id"
+BODY_XPOINTER = f"xmlns(t={TEI})xpointer(/t:TEI/t:text/t:body/*)"  # selects a fragment's <pb> and <l> elements
+
+
+def write_shards(root, shard_dir, ark):
+    """Splits a document's XML-TEI tree into one fragment per <surface> and a master file which includes
+        the fragments with XInclude. Each fragment holds the <surface> and the <pb> and <l> elements of the
+        folio's lines in the <body>. Fragments whose content has not changed are not rewritten.
+
+        shard_dir/
+        ├── bpt6k10516302.xml       (master: <teiHeader>, <xi:include> for each folio)
+        └── bpt6k10516302/
+            ├── f10.xml             (fragment: <surface xml:id="f10">, <pb corresp="f10"/>, <l>...)
+            └── f11.xml
+
+    Args:
+        root (etree._Element): etree element for the document's XML-TEI file
+        shard_dir (path): directory in which the master and the fragments are written
+        ark (string): the document's ark, ex. 'bpt6k10516302'
+
+    Returns:
+        written (int): number of fragments written to disk
+        unchanged (int): number of fragments which were already up to date
+    """
+    os.makedirs(os.path.join(shard_dir, ark), exist_ok=True)
+    # re-root the tree so that the XInclude namespace is declared once, on <TEI>
+    master = etree.Element(root.tag, root.attrib, nsmap={"xi":XI})
+    master.extend(list(root))
+    root = master
+    surface_grp = root.find("sourceDoc/surfaceGrp")
+    body = root.find("text/body")
+
+    # group the <body>'s children by the <pb> which precedes them
+    body_lines = {}
+    current = None
+    for element in list(body):
+        if element.tag == "pb":
+            current = element.get("corresp")
+            body_lines[current] = []
+        if current is not None:
+            body_lines[current].append(element)
+        body.remove(element)
+
+    written, unchanged = 0, 0
+    for surface in list(surface_grp):
+        folio = surface.get(XML_ID)
+        href = f"{ark}/{folio}.xml"
+
+        # -- FRAGMENT --
+        fragment = etree.Element("TEI", {"xmlns":TEI})
+        fragment_grp = etree.SubElement(etree.SubElement(fragment, "sourceDoc"), "surfaceGrp")
+        fragment_body = etree.SubElement(etree.SubElement(fragment, "text"), "body")
+        surface_grp.replace(surface, etree.Element(f"{{{XI}}}include", href=href, xpointer=folio))
+        fragment_grp.append(surface)
+        for element in body_lines.get(folio, []):
+            fragment_body.append(element)
+        etree.SubElement(body, f"{{{XI}}}include", href=href, xpointer=BODY_XPOINTER)
+        if write_if_changed(fragment, os.path.join(shard_dir, href)):
+            written += 1
+        else:
+            unchanged += 1
+
+    # -- MASTER --
+    write_if_changed(root, os.path.join(shard_dir, f"{ark}.xml"))
+    return written, unchanged
+
+
+def write_if_changed(root, path):
+    """Serializes an XML tree and writes it to the path unless the file already has the same content.
+
+    Args:
+        root (etree._Element): root of the XML tree
+        path (path): path of the output file
+
+    Returns:
+        changed (boolean): True if the file was written
+    """
+    xml = etree.tostring(root, encoding="UTF-8", xml_declaration=True, pretty_print=True)
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            if f.read() == xml:
+                return False
+    with open(path, "wb") as f:
+        f.write(xml)
+    return True
+
+
+def find_fragment(master, folio):
+    """Finds the fragment file of one folio by streaming through the master's <xi:include> elements.
+        The other fragments are neither opened nor parsed.
+
+    Args:
+        master (path): path to the master XML-TEI file
+        folio (string): folio number or the <surface>'s @xml:id, ex. '10' or 'f10'
+
+    Returns:
+        fragment (path): path to the fragment containing the folio
+    """
+    surface_id = folio if str(folio).startswith("f") else f"f{folio}"
+    for _, element in etree.iterparse(master, events=("end",), tag=f"{{{XI}}}include"):
+        if element.get("xpointer") == surface_id:
+            return os.path.join(os.path.dirname(master), element.get("href"))
+        element.clear()
+    raise KeyError(f"folio {surface_id} is not included in {master}")
+
+
+def read_folio(master, folio):
+    """Opens the <surface> and the <body> lines of a single folio of a sharded document.
+
+    Args:
+        master (path): path to the master XML-TEI file
+        folio (string): folio number or the <surface>'s @xml:id, ex. '10' or 'f10'
+
+    Returns:
+        surface (etree._Element): the folio's <surface>
+        lines (list): the folio's <pb> and <l> elements, in the order of the <body>
+    """
+    fragment = etree.parse(find_fragment(master, folio)).getroot()
+    surface = fragment.find(f"{{{TEI}}}sourceDoc/{{{TEI}}}surfaceGrp/{{{TEI}}}surface")
+    lines = list(fragment.find(f"{{{TEI}}}text/{{{TEI}}}body"))
+    return surface, lines
+
+
+def expand(master, output):
+    """Resolves a master's XIncludes and writes the document as a single XML-TEI file,
+        identical to the file written by make_tei() without sharding.
+
+    Args:
+        master (path): path to the master XML-TEI file
+        output (path): path of the single XML-TEI file
+    """
+    parser = etree.XMLParser(remove_blank_text=True)
+    root = etree.parse(master, parser).getroot()
+    fragments = {}
+    for include in root.findall(f".//{{{XI}}}include"):
+        href = include.get("href")
+        if href not in fragments:
+            fragments[href] = etree.parse(os.path.join(os.path.dirname(master), href), parser).getroot()
+        fragment = fragments[href]
+        if include.get("xpointer") == BODY_XPOINTER:
+            included = list(fragment.find(f"{{{TEI}}}text/{{{TEI}}}body"))
+        else:
+            included = [e for e in fragment.iter() if e.get(XML_ID) == include.get("xpointer")]
+        # moving the elements, rather than letting libxml2 copy them, keeps the master's namespace
+        # declarations and avoids a redundant xmlns on every included element
+        parent = include.getparent()
+        index = parent.index(include)
+        parent.remove(include)
+        for offset, element in enumerate(included):
+            parent.insert(index+offset, element)
+    etree.cleanup_namespaces(root)
+    with open(output, "wb") as f:
+        f.write(etree.tostring(root, encoding="UTF-8", xml_declaration=True, pretty_print=True))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and os.path.isfile(sys.argv[1]):
+        expand(sys.argv[1], sys.argv[2])
+    else:
+        print("Usage: python shards.py <master.xml> <output.xml>")
@@ -0,0 +1,134 @@
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+
+from lxml import etree
+
+NS = {'a':"http://www.loc.gov/standards/alto/ns-v4#"}  # namespace for the Alto xml
+CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "alto")  # default cache directory
+MODEL = 1  # version of the page model, to be incremented whenever parse_page() changes
+# magic, marshal version, model version, mtime of the ALTO file (ns), size of the ALTO file, SHA-1 of the ALTO file
+HEADER = struct.Struct("<4sBBqq20s")
+MAGIC = b"ALTC"
+
+
+def parse_page(path):
+    """Parses an ALTO file into the page model shared by text-extraction.py and alto2tei.py.
+        Attribute values are kept as strings, as they are in the ALTO file.
+
+        {"width", "height", "physical_img_nr", "tags":{ID:LABEL},
+         "blocks":[{"id", "tagrefs", "printspace", "hpos", "vpos", "width", "height", "points",
+                    "lines":[{"id", "tagrefs", "baseline", "hpos", "vpos", "width", "height", "points",
+                              "strings":[CONTENT, ...]}]}]}
+
+    Args:
+        path (path): path to the ALTO file
+
+    Returns:
+        page (dict): the page's tags, blocks, lines, coordinates and text
+    """
+    root = etree.parse(path).getroot()
+    page = root.find('.//a:Page', namespaces=NS)
+    model = {
+        "width":page.get("WIDTH"),
+        "height":page.get("HEIGHT"),
+        "physical_img_nr":page.get("PHYSICAL_IMG_NR"),
+        "tags":{t.get("ID"):t.get("LABEL") for t in root.iterfind('.//a:OtherTag', namespaces=NS)},
+        "blocks":[]
+    }
+    for block in root.iterfind('.//a:TextBlock', namespaces=NS):
+        model["blocks"].append({
+            **zone(block),
+            "printspace":block.getparent().tag == f"{{{NS['a']}}}PrintSpace",
+            "lines":[{
+                **zone(line),
+                "baseline":line.get("BASELINE"),
+                "strings":[s.get("CONTENT") for s in line.iterfind('a:String', namespaces=NS)]
+            } for line in block.iterfind('a:TextLine', namespaces=NS)]
+        })
+    return model
+
+
+def zone(element):
+    """Reads the attributes shared by <TextBlock> and <TextLine>.
+
+    Args:
+        element (etree._Element): a <TextBlock> or <TextLine>
+
+    Returns:
+        zone (dict): @ID, @TAGREFS, @HPOS, @VPOS, @WIDTH, @HEIGHT and the @POINTS of its first <Polygon>
+    """
+    polygon = element.find('.//a:Polygon', namespaces=NS)
+    return {
+        "id":element.get("ID"),
+        "tagrefs":element.get("TAGREFS"),
+        "hpos":element.get("HPOS"),
+        "vpos":element.get("VPOS"),
+        "width":element.get("WIDTH"),
+        "height":element.get("HEIGHT"),
+        "points":polygon.get("POINTS") if polygon is not None else None
+    }
+
+
+def cache_path(path, cache_dir):
+    """Names the cache file of an ALTO file after the SHA-1 of its absolute path."""
+    return os.path.join(cache_dir, hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()+".bin")
+
+
+def load_page(path, cache_dir=CACHE):
+    """Returns the page model of an ALTO file, from the cache when the file has not changed.
+        The cache file is memory-mapped and its header compared with the ALTO file's mtime and size; if they differ
+        the ALTO file's SHA-1 decides whether the page must be parsed again. A new or invalid entry is rewritten.
+
+    Args:
+        path (path): path to the ALTO file
+        cache_dir (path): directory of the cache files, or None to parse without caching
+
+    Returns:
+        page (dict): the page model built by parse_page()
+    """
+    if cache_dir is None:
+        return parse_page(path)
+    stat = os.stat(path)
+    entry = cache_path(path, cache_dir)
+    digest = None
+    if os.path.isfile(entry) and os.path.getsize(entry) > HEADER.size:
+        with open(entry, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, marshal_version, model, mtime, size, cached_digest = HEADER.unpack_from(mm)
+            if magic == MAGIC and marshal_version == marshal.version and model == MODEL:
+                if (mtime, size) == (stat.st_mtime_ns, stat.st_size):
+                    return marshal.loads(memoryview(mm)[HEADER.size:])
+                digest = file_digest(path)
+                if digest == cached_digest:  # touched but unchanged: keep the model, update the header
+                    page = marshal.loads(memoryview(mm)[HEADER.size:])
+                    write_entry(entry, page, stat, digest)
+                    return page
+    page = parse_page(path)
+    write_entry(entry, page, stat, digest or file_digest(path))
+    return page
+
+
+def file_digest(path):
+    """Calculates the SHA-1 of a file's content."""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+def write_entry(entry, page, stat, digest):
+    """Writes a cache file: the header followed by the marshalled page model. The file is written under a temporary
+        name and renamed, so that an interrupted run never leaves a truncated entry.
+
+    Args:
+        entry (path): path of the cache file
+        page (dict): page model built by parse_page()
+        stat (os.stat_result): status of the ALTO file
+        digest (bytes): SHA-1 of the ALTO file
+    """
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    header = HEADER.pack(MAGIC, marshal.version, MODEL, stat.st_mtime_ns, stat.st_size, digest)
+    tmp = f"{entry}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header+marshal.dumps(page))
+    os.replace(tmp, entry)
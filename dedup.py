@@ -0,0 +1,151 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+from array import array
+from collections import defaultdict
+
+from altocache import load_page
+
+BANDS = 16  # number of LSH bands
+ROWS = 8  # MinHash values per band; lines sharing one band are candidates (about 70% similarity and above)
+SHINGLE = 5  # length in characters of the shingles
+
+
+def corpus_lines(directories, min_length=20):
+    """Streams every <String>'s @CONTENT in the documents' ALTO files, read through the page cache.
+
+    Args:
+        directories (list): paths to directories named after each document's ark
+        min_length (int): lines shorter than this, once normalised, are skipped (numbering, catchwords, ...)
+
+    Yields:
+        line (dict): ark, folio, ALTO @ID of the <TextLine>, original text and normalised text
+    """
+    for directory in directories:
+        ark = os.path.basename(os.path.normpath(directory))
+        for file in sorted(glob.glob(os.path.join(directory, "*.xml"))):
+            folio = re.search(r"(.*f)(\d+)", os.path.basename(file)).group(2)
+            for block in load_page(file)["blocks"]:
+                for line in block["lines"]:
+                    for content in line["strings"]:
+                        text = " ".join((content or "").lower().split())
+                        if len(text) >= min_length:
+                            yield {"ark":ark, "folio":folio, "line":line["id"], "content":content, "text":text}
+
+
+def minhash(text):
+    """Calculates the MinHash signature of a text from its character shingles. The BANDS*ROWS hash functions are the
+        successive 32-bit words of each shingle's SHAKE-128 digest, so a shingle is hashed once for every function
+        and the minimums are taken column by column.
+
+    Args:
+        text (string): normalised text of a line
+
+    Returns:
+        signature (tuple): minimum of each hash function over the shingles
+    """
+    shingles = {text[i:i+SHINGLE] for i in range(max(1, len(text)-SHINGLE+1))}
+    hashes = [array("I", hashlib.shake_128(s.encode("utf-8")).digest(4*BANDS*ROWS)) for s in shingles]
+    return tuple(map(min, zip(*hashes)))
+
+
+def similarity(a, b):
+    """Estimates the Jaccard similarity of two lines' shingles from their signatures."""
+    return sum(x == y for x, y in zip(a, b))/len(a)
+
+
+def find(parents, i):
+    """Finds the representative of i's cluster, compressing the path on the way."""
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def near_duplicates(lines, threshold=0.8):
+    """Clusters near-identical lines with MinHash signatures and locality-sensitive hashing.
+        Each signature is cut into BANDS bands; lines which share a band fall in the same bucket. Within a bucket,
+        every line is compared with the bucket's first line only, so the work grows linearly with the corpus.
+
+    Args:
+        lines (iterable): lines from corpus_lines()
+        threshold (float): minimum estimated Jaccard similarity of two lines in a cluster
+
+    Returns:
+        lines (list): the lines read, with their signature
+        clusters (list): lists of positions in lines, for clusters of two lines or more
+    """
+    lines = list(lines)
+    buckets = defaultdict(list)
+    for i, line in enumerate(lines):
+        line["signature"] = minhash(line["text"])
+        for band in range(BANDS):
+            buckets[(band, line["signature"][band*ROWS:(band+1)*ROWS])].append(i)
+
+    parents = list(range(len(lines)))
+    for members in buckets.values():
+        first = members[0]
+        for i in members[1:]:
+            if find(parents, i) != find(parents, first) \
+                    and similarity(lines[i]["signature"], lines[first]["signature"]) >= threshold:
+                parents[find(parents, i)] = find(parents, first)
+
+    clusters = defaultdict(list)
+    for i in range(len(lines)):
+        clusters[find(parents, i)].append(i)
+    return lines, [members for members in clusters.values() if len(members) > 1]
+
+
+def leakage_groups(lines, clusters):
+    """Groups the documents which share near-duplicate lines. Keeping each group within the same split
+        (train, validation or test) prevents duplicated lines from leaking between splits.
+
+    Args:
+        lines (list): lines returned by near_duplicates()
+        clusters (list): clusters returned by near_duplicates()
+
+    Returns:
+        groups (list): sorted lists of arks, for groups of two documents or more
+    """
+    arks = sorted({line["ark"] for line in lines})
+    position = {ark:i for i, ark in enumerate(arks)}
+    parents = list(range(len(arks)))
+    for members in clusters:
+        first = position[lines[members[0]]["ark"]]
+        for i in members[1:]:
+            parents[find(parents, position[lines[i]["ark"]])] = find(parents, first)
+    groups = defaultdict(list)
+    for ark in arks:
+        groups[find(parents, position[ark])].append(ark)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate lines across the corpus with MinHash and LSH.")
+    parser.add_argument("paths", nargs="*", help="directories named after each document's ark, ex. data/bpt6k10516302")
+    parser.add_argument("--threshold", type=float, default=0.8, help="minimum estimated similarity of two lines (default: 0.8)")
+    parser.add_argument("--min-length", type=int, default=20, help="ignore lines shorter than this many characters (default: 20)")
+    parser.add_argument("--output", default=None, help="write the clusters and document groups to this JSON file")
+    args = parser.parse_args()
+    directories = [path for path in args.paths if os.path.isdir(path)]
+    if len(directories) > 0:
+        lines, clusters = near_duplicates(corpus_lines(directories, args.min_length), args.threshold)
+        groups = leakage_groups(lines, clusters)
+        report = {
+            "clusters":[[{k:lines[i][k] for k in ["ark", "folio", "line", "content"]} for i in members] for members in clusters],
+            "groups":groups
+        }
+        cross = [c for c in report["clusters"] if len({line["ark"] for line in c}) > 1]
+        print(f"{len(lines)} lines, {len(clusters)} clusters of near-duplicates, {len(cross)} across documents")
+        for cluster in report["clusters"]:
+            print("|________" + " | ".join([f'{l["ark"]} f{l["folio"]} {l["line"]}: {l["content"]}' for l in cluster]))
+        for group in groups:
+            print(f"|        keep in the same split: {', '.join(group)}")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print("No directory given")
@@ -0,0 +1,158 @@
+import glob
+import os
+import random
+import re
+import sys
+import time
+
+from lxml import etree
+
+NS = {'a':"http://www.loc.gov/standards/alto/ns-v4#"}  # namespace for the Alto xml
+TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "normalisation.tsv")  # default table of rules
+
+
+def load_table(path=TABLE):
+    """Reads a table of normalisation rules. Each line holds a source string and its replacement separated by a tab;
+        empty lines and lines starting with # are ignored. A replacement may be empty.
+
+    Args:
+        path (path): path to the tab-separated table
+
+    Returns:
+        table (dict): replacement (value) of each source string (key)
+    """
+    table = {}
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.rstrip("\n")
+            if line.strip() == "" or line.startswith("#"):
+                continue
+            if "\t" not in line:
+                raise ValueError(f"{path}, line {number}: expected 'source<TAB>replacement'")
+            source, target = line.split("\t", 1)
+            if source == "":
+                raise ValueError(f"{path}, line {number}: empty source")
+            table[source] = target
+    return table
+
+
+def trie_pattern(sources):
+    """Builds a regular expression from the trie of the source strings. Each character is tested once per
+        branch of the trie rather than once per rule, so the cost of a match does not grow with the number of rules.
+        Longer sources are preferred: ["e", "et"] gives "e(?:t)?".
+
+    Args:
+        sources (iterable): strings to match
+
+    Returns:
+        pattern (string): regular expression matching any of the sources
+    """
+    trie = {}
+    for source in sources:
+        node = trie
+        for char in source:
+            node = node.setdefault(char, {})
+        node[""] = True  # marks the end of a source
+
+    def to_regex(node):
+        branches = [re.escape(char)+to_regex(child) for char, child in sorted(node.items()) if char != ""]
+        if len(branches) == 0:
+            return ""
+        group = branches[0] if len(branches) == 1 else "(?:"+"|".join(branches)+")"
+        if "" in node:  # a source ends here: the longer ones are optional
+            return "(?:"+group+")?"
+        return group
+
+    return to_regex(trie)
+
+
+def compile_table(table):
+    """Compiles a table of rules into a normaliser which applies every rule in one pass over a text.
+
+    Args:
+        table (dict): replacement of each source string, from load_table()
+
+    Returns:
+        normaliser (dict): the table and its compiled pattern
+    """
+    pattern = re.compile(trie_pattern(table.keys())) if len(table) > 0 else None
+    return {"table":table, "pattern":pattern}
+
+
+def normalise(text, normaliser):
+    """Replaces every source string of the table found in the text, the longest source winning at each position.
+        Replacements are not normalised again.
+
+    Args:
+        text (string): text to normalise
+        normaliser (dict): normaliser from compile_table()
+
+    Returns:
+        text (string): normalised text
+    """
+    if normaliser["pattern"] is None or text is None:
+        return text
+    table = normaliser["table"]
+    return normaliser["pattern"].sub(lambda m: table[m.group()], text)
+
+
+def applied_rules(text, normaliser):
+    """Lists the rules which normalise() applies to a text, with their position.
+
+    Args:
+        text (string): text to normalise
+        normaliser (dict): normaliser from compile_table()
+
+    Returns:
+        rules (list): (start, end, source, replacement) tuples, in the order of the text
+    """
+    if normaliser["pattern"] is None or text is None:
+        return []
+    table = normaliser["table"]
+    return [(m.start(), m.end(), m.group(), table[m.group()]) for m in normaliser["pattern"].finditer(text)]
+
+
+def benchmark(directories, count=300):
+    """Compares the single-pass normaliser with one re.sub per rule over the text of every String in the directories,
+        using the default table plus synthetic rules built from the abbreviation marks of the corpus.
+
+    Args:
+        directories (list): paths to directories of ALTO files
+        count (int): number of rules in the benchmark's table
+    """
+    lines = [s.get("CONTENT") or "" for d in directories for file in sorted(glob.glob(os.path.join(d, "*.xml"))) \
+                for s in etree.parse(file).getroot().iterfind('.//a:String', namespaces=NS)]
+    rng = random.Random(15)
+    marks = ["̃", "̄", "ͣ", "ͤ", "ͥ", "ͦ", "ᷤ", "ꝰ"]
+    table = load_table()
+    while len(table) < count:
+        source = "".join(rng.choice("abcdefghilmnopqrstuvx") for _ in range(rng.randint(1, 3)))+rng.choice(marks)
+        table[source] = source[:-1]+rng.choice(["n", "m", "er", "ur", "us", "re"])
+    print(f"{len(table)} rules, {len(lines)} lines, {sum(len(l) for l in lines)} characters")
+
+    t0 = time.perf_counter()
+    normaliser = compile_table(table)
+    t1 = time.perf_counter()
+    single_pass = [normalise(line, normaliser) for line in lines]
+    t2 = time.perf_counter()
+    print(f"|        single pass: compiled in {t1-t0:.4f} s, applied in {t2-t1:.4f} s")
+
+    t0 = time.perf_counter()
+    rules = [(re.compile(re.escape(source)), target.replace("\\", r"\\")) \
+                for source, target in sorted(table.items(), key=lambda r: -len(r[0]))]
+    t1 = time.perf_counter()
+    per_rule = []
+    for line in lines:
+        for pattern, target in rules:
+            line = pattern.sub(target, line)
+        per_rule.append(line)
+    t2 = time.perf_counter()
+    print(f"|        one re.sub per rule: compiled in {t1-t0:.4f} s, applied in {t2-t1:.4f} s")
+    print(f"|        {sum(a != b for a, b in zip(single_pass, per_rule))} lines differ between the two methods")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "benchmark":
+        benchmark([path for path in sys.argv[2:] if os.path.isdir(path)])
+    else:
+        print("Usage: python normalisation.py benchmark ./data/*")
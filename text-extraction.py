@@ -1,10 +1,12 @@
 import os
 import sys
-from lxml import etree
 import re
 
+from altocache import load_page
+from normalisation import load_table, compile_table, normalise, applied_rules
 
-NS = {'a':"http://www.loc.gov/standards/alto/ns-v4#"}  # namespace for the Alto xml
+# a word (letters, digits, combining marks, ⁊), a ¬ | or - which dump() deletes because whitespace follows it, or any other character
+TOKEN = re.compile(r"(?P<word>[\w\u0300-\u036f\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f⁊]+)|(?P<join>[¬|\-](?=\s|$))|(?P<punct>\S)")
 
 
 def order_files(dir):
@@ -24,6 +26,36 @@ def order_files(dir):
     return ordered_files
 
 
+def extract_lines(ordered_files, dir):
+    """Streams through the Alto files and yields every <String> of a MainZone, MainZone#1 or MainZone#2 <TextBlock>,
+        in the order used by extract(). Each page is read from the page cache, or parsed once if it has changed.
+
+    Args:
+        ordered_files (list): files names from directory ordered by folio number
+        dir (path): path to the document's directory
+
+    Yields:
+        folio (string): folio number from the file name
+        alto_id (string): @ID of the <TextLine>
+        tei_id (string): @xml:id of the corresponding <line> in the XML-TEI file, ex. "f10_z1_l3t"
+        content (string): the <String>'s @CONTENT
+    """
+    for file in ordered_files:
+        folio = re.search(r"(.*f)(\d+)", file).group(2)
+        page = load_page("{}/{}".format(dir, file))
+        labels = page["tags"]
+        # number the blocks and lines the way alto2tei's zone_attributes() does, ignoring untagged zones
+        blocks = [b for b in page["blocks"] if b["printspace"] and b["tagrefs"] != "BT"]
+        for label in ["MainZone", "MainZone#1", "MainZone#2"]:
+            for i, block in enumerate(blocks):
+                if labels.get(block["tagrefs"]) != label:
+                    continue
+                lines = [l for l in block["lines"] if l["tagrefs"] != "LT"]
+                for j, line in enumerate(lines):
+                    for content in line["strings"]:
+                        yield folio, line["id"], f"f{folio}_z{i+1}_l{j+1}t", content
+
+
 def extract(ordered_files, dir):
     """Extracts text from Alto file's MainZone and puts each TextLine's contents into a list.
         It is possible that a document does not have a @MainZone, @MainZone#1, and/or @MainZone#2.
@@ -34,40 +66,15 @@ def extract(ordered_files, dir):
     Returns:
         text (list): text from every TextLine/String[@CONTENT] that descends from a MainZone <TextBlock>
     """    
-    text = []
-    for file in ordered_files:
-        # parses an xml file (the one currently passed in the loop through the directory's files) and gets the root of the generated etree
-        root = etree.parse("{}/{}".format(dir, file)).getroot()
-
-        # searches for the <OtherTag> whose attribute @LABEL equals "MainZone" and returns the value of that tag's attribute @ID
-        if root.find('.//a:OtherTag[@LABEL="MainZone"]', namespaces=NS) is not None:
-            mainZone_id = root.find('.//a:OtherTag[@LABEL="MainZone"]', namespaces=NS).get("ID")
-            # gets a list of @CONTENT's values for every child <String> of every MainZone <TextBlock>
-            mainZone_lines = [string.get("CONTENT") for string in root.findall('.//a:TextBlock[@TAGREFS="{}"]/a:TextLine/a:String'.format(mainZone_id), namespaces=NS)]
-            text.extend(mainZone_lines)
-
-        # searches for the <OtherTag> whose attribute @LABEL equals "MainZone#1" and returns the value of that tag's attribute @ID
-        if root.find('.//a:OtherTag[@LABEL="MainZone#1"]', namespaces=NS) is not None:
-            mainZone1_id = root.find('.//a:OtherTag[@LABEL="MainZone#1"]', namespaces=NS).get("ID")
-            # gets a list of @CONTENT's values for every child <String> of every MainZone#1 <TextBlock>
-            mainZone1_lines = [string.get("CONTENT") for string in root.findall('.//a:TextBlock[@TAGREFS="{}"]/a:TextLine/a:String'.format(mainZone1_id), namespaces=NS)]
-            text.extend(mainZone1_lines)
-
-        # searches for the <OtherTag> whose attribute @LABEL equals "MainZone#2" and returns the value of that tag's attribute @ID
-        if root.find('.//a:OtherTag[@LABEL="MainZone#2"]', namespaces=NS) is not None:
-            mainZone2_id = root.find('.//a:OtherTag[@LABEL="MainZone#2"]', namespaces=NS).get("ID")
-            # gets a list of @CONTENT's values for every child <String> of every MainZone#2 <TextBlock>
-            mainZone2_lines = [string.get("CONTENT") for string in root.findall('.//a:TextBlock[@TAGREFS="{}"]/a:TextLine/a:String'.format(mainZone2_id), namespaces=NS)]
-            text.extend(mainZone2_lines)
-
-    return text
-
-
-def dump(text, directory):
+    return [content for _, _, _, content in extract_lines(ordered_files, dir)]
+
+
+def dump(text, directory, normaliser):
     """Formats a text according to the needs of the lemmatisation team.
 
     Args:
         text (list): lines of text from a document's MainZone
+        normaliser (dict): compiled table of abbreviations and characters to normalise
     """    
     # string all the lines together
     s = " ".join(text)
@@ -83,18 +90,103 @@ def dump(text, directory):
     lines = re.sub(r"([\;\!\?\:])(\s)", r"\1\n\n", lines)
     # start a new line with the character ⁋
     lines = re.sub(r"(?<!^)(⁋)", r"\n\n\1", lines)
-    # replace the medieval abbreviation ⁊ with the word "et"
-    lines = re.sub(r"⁊", "et", lines)
+    # expand abbreviations (ex. ⁊ to "et") and normalise characters in a single pass
+    lines = normalise(lines, normaliser)
     with open(os.path.join(os.path.dirname(directory),os.path.basename(directory)+".txt"), "w") as f:
         f.write(lines)
 
 
+def tokenize(lines, normaliser):
+    """Splits the lines yielded by extract_lines() into tokens in one streaming pass, applying the same normalisations as dump().
+        A word broken by a ¬, | or - at the end of a line (or before a space) is joined with the next word, and the normalisation table is applied.
+        Every token keeps the character offsets of its parts in the original @CONTENT so that annotations of the text
+        can be projected back onto the TEI <line> elements and the ALTO <TextLine>.
+
+    Args:
+        lines (iterable): (folio, alto_id, tei_id, content) tuples from extract_lines()
+        normaliser (dict): compiled table of abbreviations and characters to normalise
+
+    Yields:
+        token (dict): normalised form, original characters, spans (folio, alto_id, tei_id, start, end) in the @CONTENT, and normalisations applied
+    """
+    pending = None  # word whose last part ends with a deleted ¬, | or -
+    previous = None  # last word yielded or pending, and the position where it ends
+    for folio, alto_id, tei_id, content in lines:
+        if content is None:
+            continue
+        for match in TOKEN.finditer(content):
+            if match.lastgroup == "join":
+                # the character is deleted; if it is glued to a word, that word continues on the next word
+                if previous is not None and previous[1] == (tei_id, match.start()):
+                    pending = previous[0]
+                    pending["spans"][-1]["end"] = match.end()
+                    pending["orig"] += match.group()
+                    if "hyphen" not in pending["norm"]:
+                        pending["norm"].append("hyphen")
+                continue
+            span = {"folio":folio, "alto_id":alto_id, "tei_id":tei_id, "start":match.start(), "end":match.end()}
+            if match.lastgroup == "word" and pending is not None:
+                token = pending
+                token["orig"] += match.group()
+                token["form"] += match.group()
+                token["spans"].append(span)
+            else:
+                if pending is not None:
+                    yield normalise_token(normaliser, pending)
+                elif previous is not None:
+                    yield normalise_token(normaliser, previous[0])
+                token = {"form":match.group(), "orig":match.group(), "spans":[span], "norm":[]}
+            pending = None
+            previous = (token, (tei_id, match.end())) if match.lastgroup == "word" else None
+            if previous is None:
+                yield normalise_token(normaliser, token)
+    if pending is not None:
+        yield normalise_token(normaliser, pending)
+    elif previous is not None:
+        yield normalise_token(normaliser, previous[0])
+
+
+def normalise_token(normaliser, token):
+    """Applies the normalisation table to a token's form and records the rules applied as "source>replacement".
+
+    Args:
+        normaliser (dict): compiled table of abbreviations and characters to normalise
+        token (dict): token built by tokenize()
+
+    Returns:
+        token (dict): the same token with its normalised form
+    """
+    rules = applied_rules(token["form"], normaliser)
+    if len(rules) > 0:
+        token["form"] = normalise(token["form"], normaliser)
+        token["norm"].extend([f"{source}>{target}" for _, _, source, target in rules])
+    return token
+
+
+def dump_tokens(tokens, directory):
+    """Writes the tokens of a document as a tab-separated file next to its text file.
+        Each part of a token is written as "id:start-end", the parts of a joined word being separated by a space.
+
+    Args:
+        tokens (iterable): tokens yielded by tokenize()
+        directory (path): path to the document's directory
+    """
+    with open(os.path.join(os.path.dirname(directory),os.path.basename(directory)+".tokens.tsv"), "w") as f:
+        f.write("form\torig\tfolio\ttei\talto\tnorm\n")
+        for token in tokens:
+            tei = " ".join([f'{s["tei_id"]}:{s["start"]}-{s["end"]}' for s in token["spans"]])
+            alto = " ".join([f'{s["alto_id"]}:{s["start"]}-{s["end"]}' for s in token["spans"]])
+            f.write(f'{token["form"]}\t{token["orig"]}\t{token["spans"][0]["folio"]}\t{tei}\t{alto}\t{",".join(token["norm"])}\n')
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         directories = [path for path in sys.argv[1:] if os.path.isdir(path)]  # create a list of directories in data/
+        normaliser = compile_table(load_table())
         for directory in directories:
             ordered_files = order_files(directory)
             text = extract(ordered_files, directory)
-            dump(text, directory)
+            dump(text, directory, normaliser)
+            dump_tokens(tokenize(extract_lines(ordered_files, directory), normaliser), directory)
     else:
         print("No directory given")